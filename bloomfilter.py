@@ -0,0 +1,84 @@
+"""
+File: bloomfilter.py
+"""
+
+import hashlib
+import math
+
+
+class BloomFilter(object):
+    """A Bloom filter: a set that answers membership with no false
+    negatives and a bounded rate of false positives.
+    Strings, bytes and numbers are hashed the same way in every
+    process, so a pickled filter stays valid; portable is False once
+    any other item (whose hash() may be randomized) has been added."""
+
+    def __init__(self, capacity, error_rate=0.01, max_bytes=None):
+        """Sizes the filter for capacity items at the given false
+        positive rate. If max_bytes is given, the bit array never
+        grows beyond it (the false positive rate rises instead)."""
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1.")
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        numBits = math.ceil(-self.capacity * math.log(error_rate)
+                            / math.log(2) ** 2)
+        if max_bytes is not None:
+            numBits = min(numBits, max_bytes * 8)
+        self._numBits = max(numBits, 8)
+        self._numHashes = max(1, round(self._numBits / self.capacity
+                                       * math.log(2)))
+        self._bits = bytearray((self._numBits + 7) // 8)
+        self.portable = True
+
+    def __contains__(self, item):
+        """Returns False if item was never added, True if it
+        probably was."""
+        bits = self._bits
+        for index in self._indexes(item):
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
+
+    def size_in_bytes(self):
+        """Returns the size of the bit array."""
+        return len(self._bits)
+
+    def _indexes(self, item):
+        """Yields the bit positions of item (double hashing)."""
+        if isinstance(item, str):
+            item = item.encode("utf-8")
+        if isinstance(item, (bytes, bytearray)):
+            digest = hashlib.blake2b(item, digest_size=16).digest()
+            first = int.from_bytes(digest[:8], "little")
+            step = int.from_bytes(digest[8:], "little") | 1
+        else:
+            # hash() of numbers is not randomized, so 1 and 1.0 still
+            # share their bits in every process
+            if not isinstance(item, (int, float)):
+                self.portable = False
+            first = hash(item)
+            step = hash((item, self._numHashes)) | 1
+        for i in range(self._numHashes):
+            yield (first + i * step) % self._numBits
+
+    def add(self, item):
+        """Adds item to self."""
+        bits = self._bits
+        for index in self._indexes(item):
+            bits[index >> 3] |= 1 << (index & 7)
+
+    def union(self, other):
+        """Adds the items of the filter other to self.
+        Raises: ValueError if the filters differ in size."""
+        if self._numBits != other._numBits or \
+                self._numHashes != other._numHashes:
+            raise ValueError("Filters differ in size.")
+        self._bits = bytearray(a | b for a, b in zip(self._bits, other._bits))
+        self.portable = self.portable and other.portable
+
+    def clear(self):
+        """Makes self become empty."""
+        self._bits = bytearray(len(self._bits))
+        self.portable = True
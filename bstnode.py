@@ -6,7 +6,11 @@ Author: Ken Lambert
 class BSTNode(object):
     """Represents a node for a linked binary search tree."""
 
+    __slots__ = ("data", "left", "right", "deleted", "priority")
+
     def __init__(self, data, left = None, right = None):
         self.data = data
         self.left = left
         self.right = right
+        self.deleted = False
+        self.priority = None
@@ -10,40 +10,182 @@ Author: Ken Lambert
 # pylint:disable=singleton-comparison
 # pylint:disable=too-many-branches
 
+import gc
+import io
 import math
 import random
+import sys
+import threading
 import time
+import tracemalloc
 import copy
 
 from abstractcollection import AbstractCollection
+from bloomfilter import BloomFilter
 from bstnode import BSTNode
 from linkedstack import LinkedStack
+from packedbst import PackedBST
 
 
 class LinkedBST(AbstractCollection):
     """An link-based binary search tree implementation."""
 
-    def __init__(self, sourceCollection=None):
+    # Limits applied by __str__; use render for a full dump
+    STR_MAX_DEPTH = 100
+    STR_MAX_NODES = 1000
+
+    def __init__(self, sourceCollection=None, splay=False,
+                 bloom_error_rate=None, bloom_max_bytes=None,
+                 lazy_delete=False, compact_threshold=0.25,
+                 background_compaction=False, balanced=False):
         """Sets the initial state of self, which includes the
-        contents of sourceCollection, if it's present."""
+        contents of sourceCollection, if it's present.
+        If splay is True, find, __contains__ and successor move
+        the accessed node to the root (self-adjusting mode).
+        If bloom_error_rate is given, a Bloom filter with that false
+        positive rate (and at most bloom_max_bytes bytes) answers
+        most lookups of absent items without walking the tree.
+        If lazy_delete is True, remove only marks nodes as deleted;
+        the tree is compacted once the share of deleted nodes exceeds
+        compact_threshold, on a background thread if
+        background_compaction is True. The tree then supports one
+        writer and any number of concurrent readers.
+        If balanced is True, self is kept as a treap: every node gets a
+        random priority that is never smaller than its children's, so
+        add, remove, split, join, insert_many and remove_range all run
+        in expected O(log n) time without calling rebalance."""
+        if splay and background_compaction:
+            raise ValueError("Splaying cannot run during a "
+                             "background compaction.")
+        if splay and balanced:
+            raise ValueError("Splaying would break the treap order.")
         self._root = None
+        self._splaying = splay
+        self._filter = None
+        self._lazy = lazy_delete
+        self._tombstones = 0
+        self._compactThreshold = compact_threshold
+        self._background = background_compaction
+        self._compactor = None
+        self._balanced = balanced
+        if bloom_error_rate is not None:
+            capacity = len(sourceCollection) \
+                if hasattr(sourceCollection, "__len__") else 0
+            self._filter = BloomFilter(capacity, bloom_error_rate,
+                                       bloom_max_bytes)
         AbstractCollection.__init__(self, sourceCollection)
 
     # Accessor methods
+    def __len__(self):
+        """Returns the number of items in self. After split or
+        join the size is unknown until it is first asked for."""
+        if self._size is None:
+            self._size = self._count_nodes(self._root)
+        return self._size
+
+    def __getstate__(self):
+        """Waits for a background compaction, so that copies and
+        pickles of self leave out the compaction thread."""
+        self._finish_compaction()
+        state = self.__dict__.copy()
+        state["_compactor"] = None
+        return state
+
+    def __deepcopy__(self, memo):
+        """Returns a deep copy of self. The nodes are copied with an
+        explicit stack, so trees of any height (such as the chain built
+        from alphabetical input) can be copied."""
+        state = self.__getstate__()
+        root = state.pop("_root")
+        result = type(self).__new__(type(self))
+        memo[id(self)] = result
+        result.__dict__.update(copy.deepcopy(state, memo))
+
+        def clone(node):
+            """
+            helper to copy one node without its children
+            :param node:
+            :return:
+            """
+            newNode = BSTNode(copy.deepcopy(node.data, memo))
+            newNode.deleted = node.deleted
+            newNode.priority = node.priority
+            return newNode
+
+        result._root = None if root is None else clone(root)
+        stack = [(root, result._root)] if root is not None else []
+        while stack:
+            node, newNode = stack.pop()
+            if node.left is not None:
+                newNode.left = clone(node.left)
+                stack.append((node.left, newNode.left))
+            if node.right is not None:
+                newNode.right = clone(node.right)
+                stack.append((node.right, newNode.right))
+        return result
+
+    def __setstate__(self, state):
+        """Restores self from state and rebuilds a Bloom filter whose
+        bit positions depend on this process's hash()."""
+        self.__dict__.update(state)
+        if self._filter is not None and not self._filter.portable:
+            self.rebuild_filter()
+
+    def _tombstone_count(self):
+        """
+        Returns the number of nodes marked as deleted.
+        :return: int
+        """
+        if self._tombstones is None:
+            self._tombstones = self._count_nodes(self._root, deleted=True)
+        return self._tombstones
+
     def __str__(self):
         """Returns a string representation with the tree rotated
-        90 degrees counterclockwise."""
-
-        def recurse(node, level):
-            s = ""
-            if node is not None:
-                s += recurse(node.right, level + 1)
-                s += "| " * level
-                s += str(node.data) + "\n"
-                s += recurse(node.left, level + 1)
-            return s
+        90 degrees counterclockwise, showing at most STR_MAX_NODES
+        nodes up to depth STR_MAX_DEPTH."""
+        stream = io.StringIO()
+        self.render(stream, self.STR_MAX_DEPTH, self.STR_MAX_NODES)
+        return stream.getvalue()
 
-        return recurse(self._root, 0)
+    def render(self, stream, max_depth=None, max_nodes=None):
+        """
+        Writes the tree rotated 90 degrees counterclockwise to the
+        file-like stream, one node per line. Subtrees below max_depth
+        are written as "...", and output stops with a "..." line once
+        max_nodes nodes have been written. Nodes marked as deleted by
+        lazy removal keep their place in the layout and are written
+        with a " (deleted)" suffix, so the view matches the structure.
+        Returns the number of nodes written, deleted ones included.
+        :param stream:
+        :param max_depth:
+        :param max_nodes:
+        :return: int
+        """
+        written = 0
+        stack = []
+        node = self._root
+        level = 0
+        while True:
+            # Walk down the right spine, deferring each node
+            while node is not None:
+                if max_depth is not None and level > max_depth:
+                    stream.write("| " * level + "...\n")
+                    break
+                stack.append((node, level))
+                node = node.right
+                level += 1
+            if not stack:
+                return written
+            node, level = stack.pop()
+            if max_nodes is not None and written >= max_nodes:
+                stream.write("...\n")
+                return written
+            stream.write("| " * level + str(node.data))
+            stream.write(" (deleted)\n" if node.deleted else "\n")
+            written += 1
+            node = node.left
+            level += 1
 
     def __iter__(self):
         """Supports a preorder traversal on a view of self."""
@@ -52,7 +194,8 @@ class LinkedBST(AbstractCollection):
             stack.push(self._root)
             while not stack.isEmpty():
                 node = stack.pop()
-                yield node.data
+                if not node.deleted:
+                    yield node.data
                 if node.right is not None:
                     stack.push(node.right)
                 if node.left is not None:
@@ -69,7 +212,8 @@ class LinkedBST(AbstractCollection):
         def recurse(node):
             if node is not None:
                 recurse(node.left)
-                lyst.append(node.data)
+                if not node.deleted:
+                    lyst.append(node.data)
                 recurse(node.right)
 
         recurse(self._root)
@@ -90,6 +234,17 @@ class LinkedBST(AbstractCollection):
     def find(self, item):
         """If item matches an item in self, returns the
         matched item, or None otherwise."""
+        if self._filter is not None and item not in self._filter:
+            return None
+        if self._splaying:
+            self._root = self._splay(self._root, item)
+            if not self._lazy:
+                if self._root is not None and self._root.data == item:
+                    return self._root.data
+                return None
+        if self._lazy:
+            node = self._find_live(item)
+            return node.data if node is not None else None
 
         def recurse(node):
             if node is None:
@@ -103,12 +258,91 @@ class LinkedBST(AbstractCollection):
 
         return recurse(self._root)
 
+    def _find_live(self, item):
+        """
+        Returns the first node matching item that is not marked as
+        deleted, or None. Both subtrees of a deleted match are searched.
+        :param item:
+        :return:
+        """
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            while node is not None:
+                if item < node.data:
+                    node = node.left
+                elif item > node.data:
+                    node = node.right
+                elif node.deleted:
+                    stack.append(node.left)
+                    node = node.right
+                else:
+                    return node
+        return None
+
+    def _splay(self, root, item):
+        """
+        Top-down splay: moves the node holding item (or the last node
+        on its search path) to the root and returns the new root.
+        :param root:
+        :param item:
+        :return:
+        """
+        if root is None:
+            return None
+        header = BSTNode(None)
+        leftMax = header
+        rightMin = header
+        while True:
+            if item < root.data:
+                if root.left is None:
+                    break
+                if item < root.left.data:
+                    # Zig-zig: rotate right
+                    child = root.left
+                    root.left = child.right
+                    child.right = root
+                    root = child
+                    if root.left is None:
+                        break
+                # Link root into the right tree
+                rightMin.left = root
+                rightMin = root
+                root = root.left
+            elif item > root.data:
+                if root.right is None:
+                    break
+                if item > root.right.data:
+                    # Zag-zag: rotate left
+                    child = root.right
+                    root.right = child.left
+                    child.left = root
+                    root = child
+                    if root.right is None:
+                        break
+                # Link root into the left tree
+                leftMax.right = root
+                leftMax = root
+                root = root.right
+            else:
+                break
+        # Reassemble the left, middle and right trees
+        leftMax.right = root.left
+        rightMin.left = root.right
+        root.left = header.right
+        root.right = header.left
+        return root
+
     def iterative_search(self, item):
         """
         search for item iteratively
         :param item:
         :return:
         """
+        if self._filter is not None and item not in self._filter:
+            return False
+        if self._lazy:
+            return self._find_live(item) is not None
         root = self._root
         while root is not None:
             if item > root.data:
@@ -120,9 +354,13 @@ class LinkedBST(AbstractCollection):
         return False
 
     def insert_iter(self, item):
+        self._finish_compaction()
+        if self._balanced:
+            self._insert_balanced(item)
+            return
         new_node = BSTNode(item)
         root = self._root
-        if self.isEmpty():
+        if root is None:
             self._root = new_node
         else:
             pointer1 = root
@@ -139,16 +377,95 @@ class LinkedBST(AbstractCollection):
                 pointer2.left = new_node
             else:
                 pointer2.right = new_node
-        self._size += 1
+        self._size = len(self) + 1
+        self._filter_add(item)
+
+    def _filter_add(self, item):
+        """
+        Records item in the Bloom filter, if there is one, and rebuilds
+        the filter as soon as the tree outgrows its capacity, so the
+        false positive rate never exceeds the configured one.
+        :param item:
+        :return:
+        """
+        if self._filter is not None:
+            self._filter.add(item)
+            if self._size is not None and \
+                    self._size > self._filter.capacity:
+                self.rebuild_filter()
+
+    def rebuild_filter(self, error_rate=None, max_bytes=None):
+        """
+        Builds a new Bloom filter sized for twice the current items,
+        e.g. after many removals. The headroom keeps rebuilds on add
+        rare. Enables the filter if self has none.
+        Arguments that are None keep the settings of the old filter.
+        :param error_rate:
+        :param max_bytes:
+        :return:
+        """
+        if self._filter is not None:
+            if error_rate is None:
+                error_rate = self._filter.error_rate
+            if max_bytes is None:
+                max_bytes = self._filter.max_bytes
+        elif error_rate is None:
+            error_rate = 0.01
+        newFilter = BloomFilter(2 * len(self), error_rate, max_bytes)
+        for item in self:
+            newFilter.add(item)
+        self._filter = newFilter
+
+    def _finish_compaction(self):
+        """
+        Waits for a background compaction, if any. Every mutator calls
+        this first, so the compaction never races with a writer.
+        :return:
+        """
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def compact(self, background=False):
+        """
+        Rebuilds self as a balanced tree without the nodes marked as
+        deleted. With background=True the new tree is built on another
+        thread; readers keep using the old nodes until it is swapped in.
+        :param background:
+        :return:
+        """
+        self._finish_compaction()
+        if background:
+            self._compactor = threading.Thread(target=self._compact,
+                                               daemon=True)
+            self._compactor.start()
+        else:
+            self._compact()
+
+    def _compact(self):
+        """
+        helper for compact
+        :return:
+        """
+        self._root = self._build_balanced(self._items_of(self._root))
+        self._tombstones = 0
 
     # Mutator methods
     def clear(self):
         """Makes self become empty."""
+        self._finish_compaction()
         self._root = None
         self._size = 0
+        self._tombstones = 0
+        if self._filter is not None:
+            self._filter.clear()
 
     def add(self, item):
         """Adds item to the tree."""
+        self._finish_compaction()
+        if self._balanced:
+            self._insert_balanced(item)
+            return
 
         # Helper function to search for item's position
         def recurse(node):
@@ -172,17 +489,23 @@ class LinkedBST(AbstractCollection):
                 # End of recurse
 
         # Tree is empty, so new item goes at the root
-        if self.isEmpty():
+        if self._root is None:
             self._root = BSTNode(item)
         # Otherwise, search for the item's spot
         else:
             recurse(self._root)
-        self._size += 1
+        self._size = len(self) + 1
+        self._filter_add(item)
 
     def remove(self, item):
         """Precondition: item is in self.
         Raises: KeyError if item is not in self.
         postcondition: item is removed from self."""
+        self._finish_compaction()
+        if self._lazy:
+            return self._remove_lazily(item)
+        if self._balanced:
+            return self._remove_balanced(item)
         if item not in self:
             raise KeyError("Item not in tree.""")
 
@@ -271,15 +594,92 @@ class LinkedBST(AbstractCollection):
             self._root = preRoot.left
         return itemRemoved
 
+    def _insert_balanced(self, item):
+        """
+        Adds item to the treap: the new node goes down the search path
+        while the nodes above it have higher priorities, and the subtree
+        it replaces is split at item into its children.
+        :param item:
+        :return:
+        """
+        node = BSTNode(item)
+        node.priority = random.random()
+        parent = None
+        current = self._root
+        while current is not None and current.priority > node.priority:
+            parent = current
+            if item < current.data:
+                current = current.left
+            else:
+                current = current.right
+        node.left, node.right = self._split_nodes(current, item)
+        if parent is None:
+            self._root = node
+        elif item < parent.data:
+            parent.left = node
+        else:
+            parent.right = node
+        self._size = len(self) + 1
+        self._filter_add(item)
+
+    def _remove_balanced(self, item):
+        """
+        Removes item from the treap by joining the subtrees of its node.
+        Raises: KeyError if item is not in self.
+        :param item:
+        :return: the removed item
+        """
+        parent = None
+        current = self._root
+        while current is not None and current.data != item:
+            parent = current
+            if item < current.data:
+                current = current.left
+            else:
+                current = current.right
+        if current is None:
+            raise KeyError("Item not in tree.")
+        newChild = self._join_nodes(current.left, current.right)
+        if parent is None:
+            self._root = newChild
+        elif parent.left is current:
+            parent.left = newChild
+        else:
+            parent.right = newChild
+        self._size = len(self) - 1
+        return current.data
+
+    def _remove_lazily(self, item):
+        """
+        Marks the node of item as deleted and compacts the tree once
+        the share of deleted nodes exceeds the threshold.
+        Raises: KeyError if item is not in self.
+        :param item:
+        :return: the removed item
+        """
+        node = self._find_live(item)
+        if node is None:
+            raise KeyError("Item not in tree.")
+        node.deleted = True
+        self._size = len(self) - 1
+        self._tombstones = self._tombstone_count() + 1
+        if self._tombstones > self._compactThreshold * \
+                (self._size + self._tombstones):
+            self.compact(self._background)
+        return node.data
+
     def replace(self, item, newItem):
         """
         If item is in self, replaces it with newItem and
         returns the old item, or returns None otherwise."""
+        self._finish_compaction()
         probe = self._root
         while probe != None:
-            if probe.data == item:
+            if probe.data == item and not probe.deleted:
                 oldData = probe.data
                 probe.data = newItem
+                if self._filter is not None:
+                    self._filter.add(newItem)
                 return oldData
             elif probe.data > item:
                 probe = probe.left
@@ -314,10 +714,45 @@ class LinkedBST(AbstractCollection):
         Return True if tree is balanced
         :return:
         """
-        if self.height() < 2 * math.log2(self._size + 1) - 1:
+        if self.height() < 2 * math.log2(len(self) + 1) - 1:
             return True
         return False
 
+    def memory_usage(self):
+        """
+        Returns the memory used by self in bytes, as reported by
+        sys.getsizeof: "nodes" counts every node (deleted ones too),
+        "keys" every distinct key object, including keys shared with
+        other structures, and "aux" the tree object and its Bloom filter.
+        :return: dict
+        """
+        nodes = 0
+        nodeBytes = 0
+        keyBytes = 0
+        keyIds = set()
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            nodes += 1
+            nodeBytes += sys.getsizeof(node)
+            if node.priority is not None:
+                nodeBytes += sys.getsizeof(node.priority)
+            if id(node.data) not in keyIds:
+                keyIds.add(id(node.data))
+                keyBytes += sys.getsizeof(node.data)
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+        auxBytes = sys.getsizeof(self)
+        if self._filter is not None:
+            auxBytes += sys.getsizeof(self._filter) + \
+                self._filter.size_in_bytes()
+        return {"nodes": nodes, "node_bytes": nodeBytes,
+                "keys": len(keyIds), "key_bytes": keyBytes,
+                "aux_bytes": auxBytes,
+                "total_bytes": nodeBytes + keyBytes + auxBytes}
+
     def range_find(self, low, high):
         """
         Returns a list of the items in the tree, where low <= item <= high
@@ -338,9 +773,9 @@ class LinkedBST(AbstractCollection):
             """
             if root is None:
                 return
-            if low < root.data:
+            if low <= root.data:
                 find_range(root.left, low, high)
-            if low <= root.data <= high:
+            if low <= root.data <= high and not root.deleted:
                 lyst.append(root.data)
             find_range(root.right, low, high)
 
@@ -352,6 +787,11 @@ class LinkedBST(AbstractCollection):
         Rebalances the tree.
         :return:
         """
+        if self._lazy or self._balanced:
+            # Rebuilding drops the deleted nodes and keeps the treap order
+            self.compact()
+            return self
+        self._finish_compaction()
         head = None
         tail = None
 
@@ -416,6 +856,353 @@ class LinkedBST(AbstractCollection):
         root.right = self.buildBST_from_DLL(mid.right)
         return root
 
+    def _count_nodes(self, node, deleted=False):
+        """
+        helper method to count the live (or the deleted) nodes
+        of a subtree
+        :param node:
+        :param deleted:
+        :return: int
+        """
+        count = 0
+        stack = [node] if node is not None else []
+        while stack:
+            node = stack.pop()
+            if node.deleted == deleted:
+                count += 1
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+        return count
+
+    def _items_of(self, node):
+        """
+        helper method to list the live items of a subtree in order
+        :param node:
+        :return: list
+        """
+        lyst = []
+        stack = []
+        while node is not None or stack:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                if not node.deleted:
+                    lyst.append(node.data)
+                node = node.right
+        return lyst
+
+    def _build_balanced(self, items):
+        """
+        helper method to build a balanced tree of sorted items,
+        with treap priorities if self is balanced
+        :param items:
+        :return: the root
+        """
+
+        def build(low, high):
+            """
+            helper to build a balanced tree of items[low:high]
+            :param low:
+            :param high:
+            :return:
+            """
+            if low >= high:
+                return None
+            mid = (low + high) // 2
+            return BSTNode(items[mid], build(low, mid),
+                           build(mid + 1, high))
+
+        root = build(0, len(items))
+        if self._balanced:
+            # Hand out random priorities from the largest down in level
+            # order, so every parent outranks its children
+            priorities = sorted((random.random() for _ in items),
+                                reverse=True)
+            level = [root] if root is not None else []
+            index = 0
+            while level:
+                nextLevel = []
+                for node in level:
+                    node.priority = priorities[index]
+                    index += 1
+                    if node.left is not None:
+                        nextLevel.append(node.left)
+                    if node.right is not None:
+                        nextLevel.append(node.right)
+                level = nextLevel
+        return root
+
+    def _split_nodes(self, node, key, inclusive=False):
+        """
+        helper method to split a subtree top-down along the search path
+        of key. Returns the roots of the nodes whose items are less than
+        key (at most key if inclusive) and of the remaining nodes.
+        Neither part is higher than the original subtree.
+        :param node:
+        :param key:
+        :param inclusive:
+        :return: tuple
+        """
+        lowerHook = BSTNode(None)
+        upperHook = BSTNode(None)
+        lowerMax = lowerHook
+        upperMin = upperHook
+        while node is not None:
+            if node.data < key or (inclusive and node.data == key):
+                lowerMax.right = node
+                lowerMax = node
+                node = node.right
+            else:
+                upperMin.left = node
+                upperMin = node
+                node = node.left
+        lowerMax.right = None
+        upperMin.left = None
+        return lowerHook.right, upperHook.left
+
+    def _join_nodes(self, lower, upper):
+        """
+        helper method to concatenate two subtrees, where every item of
+        lower is at most every item of upper. In a treap the right spine
+        of lower and the left spine of upper are merged by priority,
+        which keeps the expected height logarithmic. Otherwise the
+        maximum node of lower becomes the new root and nothing is
+        rebalanced, so the result may be one level higher than the
+        higher subtree.
+        :param lower:
+        :param upper:
+        :return: the new root
+        """
+        if lower is None:
+            return upper
+        if upper is None:
+            return lower
+        if self._balanced:
+            hook = BSTNode(None)
+            parent = hook
+            toLeft = True
+            while lower is not None and upper is not None:
+                # A node from lower takes the merged rest as its right
+                # subtree, a node from upper as its left one
+                if lower.priority > upper.priority:
+                    top = lower
+                    lower = lower.right
+                    nextLeft = False
+                else:
+                    top = upper
+                    upper = upper.left
+                    nextLeft = True
+                if toLeft:
+                    parent.left = top
+                else:
+                    parent.right = top
+                parent = top
+                toLeft = nextLeft
+            rest = lower if lower is not None else upper
+            if toLeft:
+                parent.left = rest
+            else:
+                parent.right = rest
+            return hook.left
+        parent = None
+        top = lower
+        while top.right is not None:
+            parent = top
+            top = top.right
+        if parent is not None:
+            parent.right = top.left
+            top.left = lower
+        top.right = upper
+        return top
+
+    def _tree_like(self, root, size, tombstones):
+        """
+        helper method to wrap root in a new tree with the settings
+        and a copy of the Bloom filter of self
+        :param root:
+        :param size: None if unknown
+        :param tombstones: None if unknown
+        :return: LinkedBST
+        """
+        tree = type(self)(splay=self._splaying,
+                          lazy_delete=self._lazy,
+                          compact_threshold=self._compactThreshold,
+                          background_compaction=self._background,
+                          balanced=self._balanced)
+        tree._root = root
+        tree._size = 0 if root is None else size
+        tree._tombstones = 0 if root is None else tombstones
+        tree._filter = copy.deepcopy(self._filter)
+        return tree
+
+    def split(self, key):
+        """
+        Splits self into two trees, the first holding the items less
+        than key and the second the rest. Runs in O(height) time, that
+        is expected O(log n) if self is balanced (a treap); the parts
+        keep the treap order. Without balanced mode there is no such
+        bound. Neither part is higher than self. Self becomes empty.
+        :param key:
+        :return: tuple of two LinkedBSTs
+        """
+        self._finish_compaction()
+        lower, upper = self._split_nodes(self._root, key)
+        size = self._size
+        tombstones = self._tombstones
+        # Only an empty part tells the size of the other one
+        if upper is None:
+            left = self._tree_like(lower, size, tombstones)
+        else:
+            left = self._tree_like(lower, None, None)
+        if lower is None:
+            right = self._tree_like(upper, size, tombstones)
+        else:
+            right = self._tree_like(upper, None, None)
+        self.clear()
+        return left, right
+
+    @classmethod
+    def join(cls, left, right):
+        """
+        Returns a tree holding the items of left and right, where no
+        item of left is greater than an item of right. For balanced
+        trees (treaps) the spines are merged by priority in expected
+        O(log n) time and the result is again a treap. Otherwise it runs
+        in O(height of left) time with no balance guarantee: the result
+        may be one level higher than the higher tree, so repeated joins
+        degrade its shape. Both trees become empty.
+        The result takes the settings of left; if only right uses lazy
+        deletion, right is compacted first so its deleted items stay
+        deleted.
+        Raises: ValueError if the key ranges overlap or only one of the
+        trees is balanced.
+        :param left:
+        :param right:
+        :return: LinkedBST
+        """
+        left._finish_compaction()
+        right._finish_compaction()
+        if left._balanced != right._balanced:
+            raise ValueError("Trees differ in balancing mode.")
+        if right._lazy and not left._lazy:
+            right.compact()
+        if left._root is not None and right._root is not None and \
+                left.get_max(left._root).data > \
+                right.get_min(right._root).data:
+            raise ValueError("Key ranges overlap.")
+        if left._size is None or right._size is None:
+            size = None
+        else:
+            size = left._size + right._size
+        if left._tombstones is None or right._tombstones is None:
+            tombstones = None
+        else:
+            tombstones = left._tombstones + right._tombstones
+        tree = left._tree_like(
+            left._join_nodes(left._root, right._root), size, tombstones)
+        if left._filter is not None and right._filter is not None:
+            try:
+                tree._filter.union(right._filter)
+            except ValueError:
+                tree.rebuild_filter()
+        elif right._filter is not None:
+            tree.rebuild_filter(right._filter.error_rate,
+                                right._filter.max_bytes)
+        elif left._filter is not None:
+            for item in right:
+                tree._filter.add(item)
+        if tree._filter is not None and tree._size is not None and \
+                tree._size > tree._filter.capacity:
+            tree.rebuild_filter()
+        left.clear()
+        right.clear()
+        return tree
+
+    def insert_many(self, items):
+        """
+        Adds a batch of items, best sorted. The batch is built into a
+        balanced tree that is merged into self by splitting at its
+        nodes. If self is balanced, the merge is a treap union: the
+        root with the higher priority splits the other tree, so the
+        batch costs expected O(m log(n / m + 1)) and self stays a treap.
+        Otherwise the batch nodes become the top of the tree, which
+        costs O(m * height) and may add about log m levels.
+        :param items:
+        :return:
+        """
+        self._finish_compaction()
+        batch = sorted(items)
+
+        def union(node, batchNode):
+            """
+            helper to merge the tree at batchNode into the tree at node
+            :param node:
+            :param batchNode:
+            :return: the new root
+            """
+            if batchNode is None:
+                return node
+            lower, upper = self._split_nodes(node, batchNode.data)
+            batchLeft = batchNode.left
+            batchRight = batchNode.right
+            batchNode.left = union(lower, batchLeft)
+            batchNode.right = union(upper, batchRight)
+            return batchNode
+
+        def treap_union(node, other):
+            """
+            helper to merge two treaps
+            :param node:
+            :param other:
+            :return: the new root
+            """
+            if node is None:
+                return other
+            if other is None:
+                return node
+            if node.priority < other.priority:
+                node, other = other, node
+            lower, upper = self._split_nodes(other, node.data)
+            node.left = treap_union(node.left, lower)
+            node.right = treap_union(node.right, upper)
+            return node
+
+        if self._balanced:
+            self._root = treap_union(self._root,
+                                     self._build_balanced(batch))
+        else:
+            self._root = union(self._root, self._build_balanced(batch))
+        if self._size is not None:
+            self._size += len(batch)
+        for item in batch:
+            self._filter_add(item)
+
+    def remove_range(self, low, high):
+        """
+        Removes the items where low <= item <= high with two splits
+        and a join, and returns them as a sorted list. Runs in
+        O(height + number of removed items) time, expected
+        O(log n + removed items) if self is balanced. Without balanced
+        mode the join may add a level to the tree.
+        :param low:
+        :param high:
+        :return: list
+        """
+        self._finish_compaction()
+        lower, rest = self._split_nodes(self._root, low)
+        middle, upper = self._split_nodes(rest, high, inclusive=True)
+        self._root = self._join_nodes(lower, upper)
+        lyst = self._items_of(middle)
+        if self._size is not None:
+            self._size -= len(lyst)
+        if self._tombstones:
+            self._tombstones -= self._count_nodes(middle, deleted=True)
+        return lyst
+
     def get_min(self, root):
         """
         helper method to find minimum element of a tree
@@ -445,24 +1232,28 @@ class LinkedBST(AbstractCollection):
         :return:
         :rtype:
         """
+        if self._lazy:
+            if self._splaying:
+                self._root = self._splay(self._root, item)
+            return self._live_neighbour(item, larger=True)
+        if self._splaying:
+            self._root = self._splay(self._root, item)
+
+        # Equal items may sit in either subtree (after rebalance, join,
+        # insert_many or splaying), so they are skipped like smaller ones
         root = self._root
-        if not root:
-            return None
-
         curr = None
-        while True:
+        while root is not None:
             if item < root.data:
                 curr = root
                 root = root.left
-            elif item > root.data:
-                root = root.right
             else:
-                if root.right:
-                    curr = self.get_min(root.right)
-                break
-            if root is None:
-                return curr.data if curr is not None else None
-        return curr.data if curr is not None else None
+                root = root.right
+        if curr is None:
+            return None
+        if self._splaying:
+            self._root = self._splay(self._root, curr.data)
+        return curr.data
 
     def predecessor(self, item):
         """
@@ -473,25 +1264,43 @@ class LinkedBST(AbstractCollection):
         :return:
         :rtype:
         """
+        if self._lazy:
+            return self._live_neighbour(item, larger=False)
         root = self._root
-        if not root:
-            return None
         curr = None
-        while True:
-            if item < root.data:
-                root = root.left
-            elif item > root.data:
+        while root is not None:
+            if item > root.data:
                 curr = root
                 root = root.right
             else:
-                if root.left:
-                    curr = self.get_max(root.left)
-                break
-            if root is None:
-                return curr.data if curr is not None else None
-
+                root = root.left
         return curr.data if curr is not None else None
 
+    def _live_neighbour(self, item, larger):
+        """
+        Returns the nearest item larger (or smaller) than item whose
+        node is not marked as deleted, or None. Walks the nodes beyond
+        item in order, skipping deleted ones.
+        :param item:
+        :param larger:
+        :return:
+        """
+        stack = []
+        node = self._root
+        while True:
+            while node is not None:
+                if (node.data > item) if larger else (node.data < item):
+                    stack.append(node)
+                    node = node.left if larger else node.right
+                else:
+                    node = node.right if larger else node.left
+            if not stack:
+                return None
+            node = stack.pop()
+            if not node.deleted:
+                return node.data
+            node = node.right if larger else node.left
+
     def inorder_iter(self):
         stack = []
         res = []
@@ -502,7 +1311,8 @@ class LinkedBST(AbstractCollection):
                 cur_node = cur_node.left
             elif stack:
                 cur_node = stack.pop()
-                res.append(cur_node)
+                if not cur_node.deleted:
+                    res.append(cur_node)
                 cur_node = cur_node.right
             else:
                 break
@@ -555,6 +1365,9 @@ class LinkedBST(AbstractCollection):
 
         self.find_in_btree(bt_random_rebalanced, words)
 
+        bt_packed = PackedBST(dictionary_list)
+        self.time_lookups(bt_packed, words, "Packed tree(shared buffer)")
+
     @staticmethod
     def find_in_list(words, dictionary_list):
         """
@@ -629,6 +1442,152 @@ class LinkedBST(AbstractCollection):
         bt_random_rebalanced_duration = end_bt_random_rebalanced - start_bt_random_rebalanced
         print(f"Binary Balanced tree: {bt_random_rebalanced_duration:.3f}")
 
+    def demo_splay(self, path, queries=10000, exponent=1.0):
+        """
+        Compares the splay mode with the random and rebalanced trees
+        on uniform and Zipfian query sets drawn from the dictionary.
+        :param path:
+        :param queries:
+        :param exponent: skew of the Zipfian distribution
+        :return:
+        """
+        with open(path, 'r', encoding='utf-8') as my_file:
+            dictionary_list = my_file.read().splitlines()
+        random_dictionary = dictionary_list[:]
+        random.shuffle(random_dictionary)
+
+        bt_random = LinkedBST()
+        bt_splay = LinkedBST(splay=True)
+        for i in random_dictionary:
+            bt_random.insert_iter(i)
+            bt_splay.insert_iter(i)
+        bt_balanced = LinkedBST()
+        for i in random_dictionary:
+            bt_balanced.insert_iter(i)
+        bt_balanced.rebalance()
+
+        uniform_words = random.sample(dictionary_list, queries)
+        # rank the words randomly, the i-th word is hit with weight 1/i^s
+        weights = [1 / rank ** exponent
+                   for rank in range(1, len(random_dictionary) + 1)]
+        zipf_words = random.choices(random_dictionary, weights, k=queries)
+
+        for title, words in (("uniform", uniform_words),
+                             ("Zipfian", zipf_words)):
+            print(f"Queries ({title}):")
+            self.time_lookups(bt_random, words, "Binary tree(randomly)")
+            self.time_lookups(bt_balanced, words, "Binary Balanced tree")
+            self.time_lookups(bt_splay, words, "Splay tree")
+
+    def demo_memory(self, path, sizes=(1000, 10000, 100000)):
+        """
+        Measures with tracemalloc the memory of building the
+        alphabetical, random and packed trees, of rebalancing the random
+        tree and of deep copying the trees, for several dataset sizes.
+        The words are loaded beforehand, so the linked trees share them
+        and their steady-state figures leave the keys out, while the
+        packed tree copies the keys into its buffer.
+        :param path:
+        :param sizes:
+        :return:
+        """
+        with open(path, 'r', encoding='utf-8') as my_file:
+            dictionary_list = my_file.read().splitlines()
+
+        def build_random(items):
+            """
+            helper to build a tree by adding items in the given order
+            :param items:
+            :return:
+            """
+            tree = LinkedBST()
+            for i in items:
+                tree.insert_iter(i)
+            return tree
+
+        for size in sizes:
+            words = sorted(random.sample(dictionary_list,
+                                         min(size, len(dictionary_list))))
+            random_words = words[:]
+            random.shuffle(random_words)
+            print(f"Memory ({len(words)} words):")
+            bt_alphabet = self.measure_memory(
+                "Binary tree(alphabetically)", self.build_chain, words)
+            bt_random = self.measure_memory(
+                "Binary tree(randomly)", build_random, random_words)
+            self.measure_memory(
+                "Deepcopy(alphabetically)", copy.deepcopy, bt_alphabet)
+            self.measure_memory(
+                "Deepcopy(randomly)", copy.deepcopy, bt_random)
+            bt_balanced = self.measure_memory(
+                "Rebalance", bt_random.rebalance)
+            self.measure_memory(
+                "Deepcopy(balanced)", copy.deepcopy, bt_balanced)
+            self.measure_memory(
+                "Packed tree(shared buffer)", PackedBST, words)
+
+    @staticmethod
+    def build_chain(words):
+        """
+        build a tree from sorted words the way demo_bst does,
+        as a chain of right children
+        :param words:
+        :return:
+        """
+        tree = LinkedBST()
+        node = None
+        for i in words:
+            if node is None:
+                tree._root = node = BSTNode(i)
+            else:
+                node.right = BSTNode(i)
+                node = node.right
+        tree._size = len(words)
+        return tree
+
+    @staticmethod
+    def measure_memory(title, build, *args):
+        """
+        run build(*args) under tracemalloc, print the memory it
+        allocated and still holds (steady), its peak and the
+        memory_usage() total of the result, and return the result
+        :param title:
+        :param build:
+        :param args:
+        :return:
+        """
+        gc.collect()
+        tracemalloc.start()
+        result = build(*args)
+        gc.collect()
+        steady, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line = f"{title}: steady {steady / 1024:.0f} KiB, " \
+               f"peak {peak / 1024:.0f} KiB"
+        if hasattr(result, "memory_usage"):
+            total = result.memory_usage()["total_bytes"]
+            line += f", accounted {total / 1024:.0f} KiB"
+        print(line)
+        return result
+
+    @staticmethod
+    def time_lookups(tree, words, title):
+        """
+        find words in tree with __contains__ and print the duration
+        :param tree:
+        :param words:
+        :param title:
+        :return:
+        """
+        start = time.time()
+        for i in words:
+            if i in tree:
+                something = True
+            else:
+                something = False
+        duration = time.time() - start
+        print(f"{title}: {duration:.3f}")
+
 
 if __name__ == "__main__":
     lbst_demo = LinkedBST()
@@ -649,6 +1608,8 @@ if __name__ == "__main__":
     # print(new_new)
 
     lbst_demo.demo_bst('words.txt')
+    lbst_demo.demo_splay('words.txt')
+    lbst_demo.demo_memory('words.txt')
     # print(lbst_demo)
     # lbst = LinkedBST()
     # lbst.add(4)
@@ -0,0 +1,233 @@
+"""
+File: packedbst.py
+"""
+
+import sys
+from array import array
+
+from abstractcollection import AbstractCollection
+
+
+class PackedBST(AbstractCollection):
+    """A sorted array of strings meant for bulk loading. It supports
+    the lookups of LinkedBST (find, __contains__, iterative_search,
+    successor, predecessor, range_find and inorder iteration) plus add,
+    remove, clear and memory_usage, but none of the tree shaping
+    methods. All keys live in one contiguous buffer and slot i of the sorted offset and length arrays points at a key, so
+    a search bisects the slots like a walk down a perfectly balanced
+    tree. Keys are decoded only when they are handed back to the
+    caller. Comparisons are not zero-copy: memoryview slices cannot be
+    ordered, so each step of a search copies the key it compares.
+    add and remove shift the arrays and take O(n) time."""
+
+    # UTF-8 keeps the order of the code points, so comparing the
+    # encoded keys orders them exactly like the strings
+    ENCODING = "utf-8"
+
+    # Number of items shown by __str__
+    STR_MAX_NODES = 1000
+
+    def __init__(self, sourceCollection=None):
+        """Sets the initial state of self, which includes the
+        contents of sourceCollection, if it's present."""
+        self._buffer = bytearray()
+        self._offsets = array("I")
+        self._lengths = array("I")
+        self._deadBytes = 0
+        AbstractCollection.__init__(self)
+        if sourceCollection:
+            self._load(sourceCollection)
+
+    def _load(self, sourceCollection):
+        """
+        Bulk loads the keys of sourceCollection into the empty self.
+        :param sourceCollection:
+        :return:
+        """
+        keys = sorted(item.encode(self.ENCODING) for item in sourceCollection)
+        offset = 0
+        for key in keys:
+            self._offsets.append(offset)
+            self._lengths.append(len(key))
+            offset += len(key)
+        self._buffer = bytearray(b"".join(keys))
+        self._size = len(keys)
+
+    def _key(self, index):
+        """
+        Returns a copy of the encoded key in slot index.
+        :param index:
+        :return: bytearray
+        """
+        offset = self._offsets[index]
+        return self._buffer[offset:offset + self._lengths[index]]
+
+    def _item(self, index):
+        """
+        Returns the decoded key in slot index.
+        :param index:
+        :return: str
+        """
+        offset = self._offsets[index]
+        return self._buffer[offset:offset + self._lengths[index]] \
+            .decode(self.ENCODING)
+
+    def _bisect(self, key, right=False):
+        """
+        Returns the first slot whose key is not less than key
+        (greater than key if right is True).
+        :param key:
+        :param right:
+        :return: int
+        """
+        low = 0
+        high = self._size
+        while low < high:
+            mid = (low + high) // 2
+            midKey = self._key(mid)
+            if midKey < key or (right and midKey == key):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    # Accessor methods
+    def __str__(self):
+        """Returns the string representation of self, showing at
+        most STR_MAX_NODES items."""
+        shown = [self._item(index)
+                 for index in range(min(self._size, self.STR_MAX_NODES))]
+        if self._size > self.STR_MAX_NODES:
+            shown.append("...")
+        return "[" + ", ".join(shown) + "]"
+
+    def __iter__(self):
+        """Supports an inorder traversal on a view of self."""
+        for index in range(self._size):
+            yield self._item(index)
+
+    def inorder(self):
+        """Supports an inorder traversal on a view of self."""
+        return iter(self)
+
+    def __contains__(self, item):
+        """Returns True if target is found or False otherwise."""
+        return self.find(item) is not None
+
+    def find(self, item):
+        """If item matches an item in self, returns the
+        matched item, or None otherwise."""
+        key = item.encode(self.ENCODING)
+        index = self._bisect(key)
+        if index < self._size and self._key(index) == key:
+            return self._item(index)
+        return None
+
+    def iterative_search(self, item):
+        """
+        search for item iteratively
+        :param item:
+        :return:
+        """
+        return self.find(item) is not None
+
+    def successor(self, item):
+        """
+        Returns the smallest item that is larger than
+        item, or None if there is no such item.
+        :param item:
+        :return:
+        """
+        index = self._bisect(item.encode(self.ENCODING), right=True)
+        if index < self._size:
+            return self._item(index)
+        return None
+
+    def predecessor(self, item):
+        """
+        Returns the largest item that is smaller than
+        item, or None if there is no such item.
+        :param item:
+        :return:
+        """
+        index = self._bisect(item.encode(self.ENCODING)) - 1
+        if index >= 0:
+            return self._item(index)
+        return None
+
+    def range_find(self, low, high):
+        """
+        Returns a list of the items in the tree, where low <= item <= high
+        :param low:
+        :param high:
+        :return:
+        """
+        start = self._bisect(low.encode(self.ENCODING))
+        end = self._bisect(high.encode(self.ENCODING), right=True)
+        return [self._item(index) for index in range(start, end)]
+
+    def memory_usage(self):
+        """
+        Returns the memory used by self in bytes, as reported by
+        sys.getsizeof: "nodes" are the slots with the offset and length
+        arrays, "keys" the shared buffer (including the bytes of removed
+        keys not yet reclaimed) and "aux" the tree object.
+        :return: dict
+        """
+        nodeBytes = sys.getsizeof(self._offsets) + \
+            sys.getsizeof(self._lengths)
+        keyBytes = sys.getsizeof(self._buffer)
+        auxBytes = sys.getsizeof(self)
+        return {"nodes": self._size, "node_bytes": nodeBytes,
+                "keys": self._size, "key_bytes": keyBytes,
+                "aux_bytes": auxBytes,
+                "total_bytes": nodeBytes + keyBytes + auxBytes}
+
+    # Mutator methods
+    def clear(self):
+        """Makes self become empty."""
+        self._buffer = bytearray()
+        self._offsets = array("I")
+        self._lengths = array("I")
+        self._deadBytes = 0
+        self._size = 0
+
+    def add(self, item):
+        """Adds item to the tree in O(n) time."""
+        key = item.encode(self.ENCODING)
+        index = self._bisect(key, right=True)
+        self._offsets.insert(index, len(self._buffer))
+        self._lengths.insert(index, len(key))
+        self._buffer += key
+        self._size += 1
+
+    def remove(self, item):
+        """Precondition: item is in self.
+        Raises: KeyError if item is not in self.
+        postcondition: item is removed from self in O(n) time."""
+        key = item.encode(self.ENCODING)
+        index = self._bisect(key)
+        if index == self._size or self._key(index) != key:
+            raise KeyError("Item not in tree.")
+        itemRemoved = self._item(index)
+        self._deadBytes += self._lengths[index]
+        del self._offsets[index]
+        del self._lengths[index]
+        self._size -= 1
+        # Reclaim the bytes of removed keys once they fill half the buffer
+        if self._deadBytes > len(self._buffer) // 2:
+            self._repack()
+        return itemRemoved
+
+    def _repack(self):
+        """
+        Copies the live keys into a new buffer, dropping removed ones.
+        :return:
+        """
+        keys = [self._key(index) for index in range(self._size)]
+        offset = 0
+        for index, key in enumerate(keys):
+            self._offsets[index] = offset
+            offset += len(key)
+        self._buffer = bytearray(b"".join(keys))
+        self._deadBytes = 0